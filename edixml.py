@@ -12,9 +12,13 @@ Features
 Functions
 ---------
 parse_edi(data: bytes)                -> list
+iter_segments(fp)                     -> Iterator[list]
 make_edi(segments: list)              -> bytes
 parse_xml(root: ElementTree.Element)  -> list
 make_xml(segments: list)              -> ElementTree.Element
+make_xml_bytes(segments: list)        -> bytes
+iter_xml_bytes(segments: list)        -> Iterator[bytes]
+write_xml(segments: list, fp)         -> None
 pretty_xml(root: ElementTree.Element) -> str
 
 Experimental
@@ -32,6 +36,10 @@ Data-type
 >>> type(segments)
 <class 'list'>
 
+Large interchanges parse faster with the garbage-collector paused, for the whole process while parsing
+>>> parse_edi(edi, disable_gc=True) == segments and gc.isenabled()
+True
+
 >>> pprint.pprint(segments)
 [['UNA', [':', '+', '.', '?', ' ', "'"]],
  ['UNB',
@@ -62,6 +70,39 @@ Data-type
  ['UNT', [['22'], ['SSDD1']]],
  ['UNZ', [['1'], ['6002']]]]
 
+Streaming
+---------
+>>> import io
+>>> list(iter_segments(io.BytesIO(edi), chunk_size=64)) == segments
+True
+
+Interchanges beyond the sniffed head are parsed block by block, released terminators and line-breaks may span chunks
+>>> interchange = make_edi(segments + segments[1:] * 3, with_newline=True, with_carriage_return=True)
+>>> len(interchange) > 1024 and b"?'" in interchange
+True
+>>> all(list(iter_segments(io.BytesIO(interchange), chunk_size=size)) == parse_edi(interchange) for size in (1, 7))
+True
+>>> interchange = make_edi(segments + segments[1:] * 3, with_newline=True)
+>>> all(list(iter_segments(io.BytesIO(interchange), chunk_size=size)) == parse_edi(interchange) for size in (1, 7))
+True
+
+One line-break per segment-terminator, whatever the chunk-size
+>>> broken = b"'\\n\\nUNZ".join(interchange.rsplit(b"'\\nUNZ", 1))
+>>> parse_edi(broken)
+Traceback (most recent call last):
+...
+SyntaxError: Segment 89: Expected datalement-separator + got Z
+>>> list(iter_segments(io.BytesIO(broken), chunk_size=1))
+Traceback (most recent call last):
+...
+SyntaxError: Segment 89: Expected datalement-separator + got Z
+
+Encoding
+--------
+The syntax-identifier of the UNB picks the encoding, with or without a UNA before it (UNOD is latin-2)
+>>> parse_edi(b"UNB+UNOD:3+\\xa1'")
+[['UNB', [['UNOD', '3'], ['Ą']]]]
+
 Indexing
 --------
 >>> segments[7]
@@ -158,6 +199,12 @@ True
 >>> edi == make_edi(parse_edi(edmoji))
 True
 
+The release-char is released itself, a value may end with it
+>>> make_edi([['FTX', [['A?'], ['B']]]], with_una=False)
+b"FTX+A??+B'"
+>>> parse_edi(make_edi([['FTX', [['A?'], ['B']]]], with_una=False))
+[['FTX', [['A?'], ['B']]]]
+
 XML
 ---
 >>> xml = make_xml(segments)
@@ -177,6 +224,16 @@ Index semantics
 
 Formatting
 ----------
+>>> make_xml_bytes(segments) == ElementTree.tostring(xml)
+True
+
+>>> fp = io.BytesIO()
+>>> write_xml(segments, fp)
+>>> fp.getvalue() == b''.join(iter_xml_bytes(segments)) == ElementTree.tostring(xml)
+True
+>>> make_xml_bytes([['É', []]]) == ElementTree.tostring(make_xml([['É', []]]))
+True
+
 >>> ElementTree.tostring(xml)
 b"<EDIFACT><UNA>:+.? '</UNA><UNB><UNB0><UNB00>UNOY</UNB00><UNB01>3</UNB01></UNB0><UNB1><UNB10>INVALIDATORSTUDIO</UNB10><UNB11>1</UNB11></UNB1><UNB2><UNB20>BYTESREADER</UNB20><UNB21>1</UNB21></UNB2><UNB3><UNB30>20180630</UNB30><UNB31>1159</UNB31></UNB3><UNB4><UNB40>6002</UNB40></UNB4></UNB><UNH><UNH0><UNH00>SSDD1</UNH00></UNH0><UNH1><UNH10>ORDERS</UNH10><UNH11>D</UNH11><UNH12>03B</UNH12><UNH13>UN</UNH13><UNH14>EAN008</UNH14></UNH1></UNH><BGM><BGM0><BGM00>220</BGM00></BGM0><BGM1><BGM10>BKOD99</BGM10></BGM1><BGM2><BGM20>9</BGM20></BGM2></BGM><DTM><DTM0><DTM00>137</DTM00><DTM01>20180630</DTM01><DTM02>102</DTM02></DTM0></DTM><NAD><NAD0><NAD00>BY</NAD00></NAD0><NAD1><NAD10>31-424-2022</NAD10><NAD11 /><NAD12>16</NAD12></NAD1></NAD><NAD><NAD0><NAD00>SU</NAD00></NAD0><NAD1><NAD10>34-093-1588</NAD10><NAD11 /><NAD12>16</NAD12></NAD1></NAD><LIN><LIN0><LIN00>1</LIN00></LIN0><LIN1><LIN10>1</LIN10></LIN1><LIN2><LIN20>0764569104</LIN20><LIN21>IB</LIN21></LIN2></LIN><QTY><QTY0><QTY00>1</QTY00><QTY01>25</QTY01></QTY0></QTY><FTX><FTX0><FTX00>AFM</FTX00></FTX0><FTX1><FTX10>1</FTX10></FTX1><FTX2><FTX20 /></FTX2><FTX3><FTX30>XPATH 2.0 PROGRAMMER'S REFERENCE</FTX30></FTX3></FTX><LIN><LIN0><LIN00>2</LIN00></LIN0><LIN1><LIN10>1</LIN10></LIN1><LIN2><LIN20>0764569090</LIN20><LIN21>IB</LIN21></LIN2></LIN><QTY><QTY0><QTY00>1</QTY00><QTY01>25</QTY01></QTY0></QTY><FTX><FTX0><FTX00>AFM</FTX00></FTX0><FTX1><FTX10>1</FTX10></FTX1><FTX2><FTX20 /></FTX2><FTX3><FTX30>XSLT 2.0 PROGRAMMER'S REFERENCE</FTX30></FTX3></FTX><LIN><LIN0><LIN00>3</LIN00></LIN0><LIN1><LIN10>1</LIN10></LIN1><LIN2><LIN20>1861004656</LIN20><LIN21>IB</LIN21></LIN2></LIN><QTY><QTY0><QTY00>1</QTY00><QTY01>16</QTY01></QTY0></QTY><FTX><FTX0><FTX00>AFM</FTX00></FTX0><FTX1><FTX10>1</FTX10></FTX1><FTX2><FTX20 /></FTX2><FTX3><FTX30>JAVA SERVER PROGRAMMING</FTX30></FTX3></FTX><LIN><LIN0><LIN00>4</LIN00></LIN0><LIN1><LIN10>1</LIN10></LIN1><LIN2><LIN20>0-19-501476-6</LIN20><LIN21>IB</LIN21></LIN2></LIN><QTY><QTY0><QTY00>1</QTY00><QTY01>10</QTY01></QTY0></QTY><FTX><FTX0><FTX00>AFM</FTX00></FTX0><FTX1><FTX10>1</FTX10></FTX1><FTX2><FTX20 /></FTX2><FTX3><FTX30>TZUN TZU</FTX30></FTX3></FTX><UNS><UNS0><UNS00>S</UNS00></UNS0></UNS><CNT><CNT0><CNT00>2</CNT00><CNT01>4</CNT01></CNT0></CNT><UNT><UNT0><UNT00>22</UNT00></UNT0><UNT1><UNT10>SSDD1</UNT10></UNT1></UNT><UNZ><UNZ0><UNZ00>1</UNZ00></UNZ0><UNZ1><UNZ10>6002</UNZ10></UNZ1></UNZ></EDIFACT>"
 
@@ -417,6 +474,23 @@ b"<EDIFACT><UNA>:+.? '</UNA><UNB><UNB0><UNB00>UNOY</UNB00><UNB01>3</UNB01></UNB0
 </EDIFACT>
 <BLANKLINE>
 
+Namespaced trees are written with prefixes
+>>> print(pretty_xml(ElementTree.fromstring('<a xmlns="urn:x"><b xmlns:p="urn:p" p:c="1"/></a>')))
+<?xml version="1.0" ?>
+<ns0:a xmlns:ns0="urn:x" xmlns:ns1="urn:p">
+    <ns0:b ns1:c="1"/>
+</ns0:a>
+<BLANKLINE>
+
+Attributes are written in sorted order, whatever their values
+>>> print(pretty_xml(ElementTree.fromstring('<a xmlns:p="urn:p"><b z="1" y="x {2"/><c z="1" p:y="2"/></a>')))
+<?xml version="1.0" ?>
+<a xmlns:ns0="urn:p">
+    <b y="x {2" z="1"/>
+    <c ns0:y="2" z="1"/>
+</a>
+<BLANKLINE>
+
 Mapping EDI <-> XML
 -------------------
 >>> edi == make_edi(parse_xml(xml))
@@ -636,6 +710,9 @@ Section control <UNZ>
     Interchange control reference <6002> (0020)
 <BLANKLINE>
 
+>>> report(segments, sd, ed, parallel=True) == report(segments, sd, ed)
+True
+
 >>> edi_xml = make_edi_xml(segments, sd, ed)
 >>> print(pretty_xml(edi_xml))
 <?xml version="1.0" ?>
@@ -871,9 +948,15 @@ Section control <UNZ>
 <BLANKLINE>
 
 """
+import gc
+import os
 import re
+import codecs
+import contextlib
+import sys
 import pprint
-import xml.dom.minidom
+import functools
+import collections
 from xml.etree import ElementTree
 
 
@@ -888,6 +971,13 @@ SEGMENT_TERMINATOR = "'"     # end of a 'segment'
 NEWLINE = '\n'
 CARRIAGE_RETURN = '\r'
 
+# readable names of invalid control-characters
+_METAS = {
+    '\r': '\\r - Carriage return',
+    '\n': '\\n - Newline',
+    '\t': '\\t - Tab'
+}
+
 ENCODINGS = {
     'UNOA': {
         'ENCODING': 'ascii',
@@ -925,7 +1015,7 @@ ENCODINGS = {
     'UNOW': {'ENCODING': 'utf16'}            # ISO 10646-1 octet with code extension
 }
 
-SEGMENTS = {
+SEGMENTS = frozenset({
     'ADR', 'AGR', 'AJT', 'ALC', 'ALI', 'APP', 'APR', 'ARD', 'ARR', 'ASI', 'ATT', 'AUT', 'BAS', 'BGM', 'BII', 'BUS',
     'CAV', 'CCD', 'CCI', 'CDI', 'CDS', 'CDV', 'CED', 'CIN', 'CLA', 'CLI', 'CMP', 'CNI', 'CNT', 'COD', 'COM', 'COT',
     'CPI', 'CPS', 'CPT', 'CST', 'CTA', 'CUX', 'DAM', 'DFN', 'DGS', 'DII', 'DIM', 'DLI', 'DLM', 'DMS', 'DOC', 'DRD',
@@ -938,7 +1028,214 @@ SEGMENTS = {
     'STS', 'TAX', 'TCC', 'TDT', 'TEM', 'TMD', 'TMP', 'TOD', 'TPL', 'TRU', 'TSR', 'UCD', 'UCF', 'UCI', 'UCM', 'UCS',
     'UGH', 'UGT', 'UIB', 'UIH', 'UIR', 'UIT', 'UIZ', 'UNB', 'UNE', 'UNG', 'UNH', 'UNO', 'UNP', 'UNS', 'UNT', 'UNZ',
     'USA', 'USB', 'USC', 'USD', 'USE', 'USF', 'USH', 'USL', 'USR', 'UST', 'USU', 'USX', 'USY', 'VLI'
-}
+})
+
+# bytes searched for the UNB to sniff the encoding, room for UNA and UNB
+_SNIFF_SIZE = 1024
+
+# interned segment-tags, all parsed segments share these strings and compare by identity first
+_SEGMENT_TAGS = {segment: sys.intern(segment) for segment in SEGMENTS}
+
+
+def _escape_xml(text, quotes=False):
+    text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return text.replace('"', '&quot;') if quotes else text
+
+
+def _pretty_element(root, write, addindent):
+    # pre-order walk with an explicit stack, pending closing-tags and tails are pushed as plain strings,
+    # False (with the output incomplete) as soon as a {uri}local name needs a prefix and xmlns declaration
+    indents = ['']
+    stack = [(root, 0)]
+    pop, push = stack.pop, stack.append
+    while stack:
+        element, depth = pop()
+        if element.__class__ is str:
+            write(element)
+            continue
+        if depth == len(indents):
+            indents.append(indents[-1] + addindent)
+        indent = indents[depth]
+
+        tag = element.tag
+        if tag is ElementTree.Comment:
+            write(f'{indent}<!--{element.text}-->\n')
+            continue
+        if tag is ElementTree.ProcessingInstruction:
+            write(f'{indent}<?{element.text}?>\n')
+            continue
+
+        if tag[:1] == '{':
+            return False
+
+        # attributes in sorted order, as written by minidom up to Python 3.7
+        attributes = ''
+        if element.attrib:
+            if '{' in ''.join(element.attrib):
+                return False  # xml-names never contain '{', only the {uri}local form does
+            attributes = ''.join(f' {name}="{_escape_xml(value, quotes=True)}"'
+                                 for name, value in sorted(element.attrib.items()))
+        if not len(element):
+            if element.text:
+                write(f'{indent}<{tag}{attributes}>{_escape_xml(element.text, quotes=True)}</{tag}>\n')
+            else:
+                write(f'{indent}<{tag}{attributes}/>\n')
+            continue
+
+        write(f'{indent}<{tag}{attributes}>\n')
+        child_depth = depth + 1
+        child_indent = indent + addindent
+        if element.text:
+            write(f'{child_indent}{_escape_xml(element.text, quotes=True)}\n')
+        push((f'{indent}</{tag}>\n', depth))
+        for child in reversed(element):
+            if child.tail:
+                push((f'{child_indent}{_escape_xml(child.tail, quotes=True)}\n', child_depth))
+            push((child, child_depth))
+    return True
+
+
+@contextlib.contextmanager
+def _gc_disabled(disable):
+    # segments are nested lists of strings without reference cycles, collecting them while they grow is wasted work,
+    # only on request as it pauses the collector of the whole process
+    if not disable or not gc.isenabled():
+        yield
+        return
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.enable()
+
+
+@functools.lru_cache(maxsize=None)
+def _patterns(component_separator, dataelement_separator, release_char, segment_terminator, newline, carriage_return):
+    # handling special-characters as non-regex-metacharacters for pattern matching
+    cs = re.escape(component_separator)
+    ds = re.escape(dataelement_separator)
+    rc = re.escape(release_char)
+    st = re.escape(segment_terminator)
+    nl = re.escape(newline)
+    cr = re.escape(carriage_return)
+
+    # a segment is a run of released or non-terminating characters, followed by its terminator (or the end of data)
+    splitter = re.compile(f'([^{rc}{st}]*(?:{rc}.[^{rc}{st}]*)*)({st}(?:{cr}?{nl})?|\\Z)', re.DOTALL)
+    # a value is a run of released or non-special characters, followed by its delimiter (or the end of segment)
+    tokenizer = re.compile(f'([^{cs}{ds}{rc}]*(?:{rc}.[^{cs}{ds}{rc}]*)*)({cs}|{ds}|\\Z)', re.DOTALL)
+    # special-characters used as values are preceded by the release-char
+    release = re.compile(f'{rc}([{cs}{ds}{rc}{st}])')
+    return splitter, tokenizer, release
+
+
+def _segment_tag(line, index, dataelement_separator):
+    tag = line[:3]
+    assert tag != 'UNA', 'Error: multiple UNA in one message'
+    if line[3:4] != dataelement_separator:
+        raise SyntaxError(f'Segment {index+1}: Expected datalement-separator {dataelement_separator} got {line[3:4]}')
+    segment = _SEGMENT_TAGS.get(tag)
+    if segment is None:
+        raise SyntaxError(f'Unknown segment {tag}')
+    return segment
+
+
+def _sniff_encoding(data, default_encoding):
+    # the syntax-identifier of the UNB, searched within the head of the interchange only
+    uno = default_encoding
+    unb_index = data.find(b'UNB', 0, _SNIFF_SIZE)
+    if unb_index != -1:
+        uno_index = data.find(b'UNO', unb_index, _SNIFF_SIZE)
+        if uno_index != -1:
+            uno = data[uno_index:uno_index+4].decode('ascii')
+    if uno not in ENCODINGS:
+        raise ValueError(f'Unknown encoding {uno}')
+    return uno
+
+
+def _fallback_encodings(uno):
+    # the sniffed encoding first, then all others, each codec once (UNOA and UNOB are both ascii)
+    tried = {codecs.lookup(ENCODINGS[uno]['ENCODING']).name}
+    yield uno
+    for encoding in ENCODINGS:
+        codec = codecs.lookup(ENCODINGS[encoding]['ENCODING']).name
+        if codec not in tried:
+            tried.add(codec)
+            yield encoding
+
+
+def _warn_invalid_characters(content, uno, offset=0):
+    accepted = ENCODINGS[uno].get('ACCEPTED_CHARACTERS')
+    accepted = frozenset(accepted) if accepted else None
+    for i, c in enumerate(content, offset):
+        if not c.isprintable() or (accepted is not None and c not in accepted):
+            print(f'Warning {uno} invalid character at index {i} {_METAS.get(c, c)}')
+
+
+def _last_terminator(content, segment_terminator, release_char):
+    # index of the last segment-terminator not preceded by an odd run of release-chars
+    index = content.rfind(segment_terminator)
+    while index != -1:
+        run_start = index
+        while run_start and content[run_start-1] == release_char:
+            run_start -= 1
+        if not (index - run_start) % 2:
+            return index
+        index = content.rfind(segment_terminator, 0, run_start)
+    return index
+
+
+def _parse_segments(segments, content, start, offset,
+                    component_separator, dataelement_separator, release_char, segment_terminator,
+                    newline, carriage_return):
+    # appends the segments of content to segments, start is past the UNA segment (if any)
+    splitter, tokenizer, release = _patterns(component_separator, dataelement_separator, release_char, segment_terminator,
+                                             newline, carriage_return)
+    segment_tags = _SEGMENT_TAGS
+
+    # without any release-char the special-characters are plain delimiters
+    if content.find(release_char, start) == -1:
+        if newline in content:
+            # one line-break per segment-terminator, CRLF is folded into LF first so none is removed twice
+            content = content.replace(segment_terminator + carriage_return + newline, segment_terminator + newline)
+            content = content.replace(segment_terminator + newline, segment_terminator)
+        lines = content.split(segment_terminator)[:-1]  # last seg empty
+        if start:
+            del lines[0]  # UNA
+        for line in lines:
+            segment = segment_tags.get(line[:3])
+            if segment is None or line[3:4] != dataelement_separator:
+                segment = _segment_tag(line, offset + len(segments), dataelement_separator)  # raises
+            segments.append([segment, [data_element.split(component_separator)
+                                       for data_element in line[4:].split(dataelement_separator)]])
+        return segments
+
+    # only segments containing the release-char are tokenized, all others are split
+    for line, terminator in splitter.findall(content, start):
+        if not terminator:
+            break  # anything after the last segment-terminator is dropped
+        segment = segment_tags.get(line[:3])
+        if segment is None or line[3:4] != dataelement_separator:
+            segment = _segment_tag(line, offset + len(segments), dataelement_separator)  # raises
+        if release_char not in line:
+            segments.append([segment, [data_element.split(component_separator)
+                                       for data_element in line[4:].split(dataelement_separator)]])
+            continue
+
+        # one token per value, paired with the delimiter that ends it
+        data_elements, components = [], []
+        for value, delimiter in tokenizer.findall(line, 4):
+            if release_char in value:
+                value = release.sub(r'\1', value)
+            components.append(value)
+            if delimiter == component_separator:
+                continue
+            data_elements.append(components)
+            components = []
+            if not delimiter:
+                break
+        segments.append([segment, data_elements])
+
+    return segments
 
 
 def parse_edi(data: bytes,
@@ -950,48 +1247,27 @@ def parse_edi(data: bytes,
               newline=NEWLINE,
               carriage_return=CARRIAGE_RETURN,
               warn_invalid_characters=False,
-              default_encoding='UNOY') -> list:
+              default_encoding='UNOY',
+              disable_gc=False) -> list:
 
     assert type(data) == bytes, f'Expected <bytes>, got {type(data).__qualname__}'
 
     # sniffing the (optional) encoding
-    try:
-        unb_index = data.index(b'UNB')
-    except ValueError:
-        unb_index = False
-    if unb_index:
-        uno_offset = data[unb_index:].index(b'UNO')
-        uno = data[unb_index + uno_offset:unb_index + uno_offset+4].decode('ascii')
-    else:
-        uno = default_encoding
-    if uno not in ENCODINGS:
-        raise ValueError(f'Unknown encoding {uno}')
+    uno = _sniff_encoding(data, default_encoding)
 
     # decode (if default fails, all other encodings are tried)
-    try:
-        content = data.decode(ENCODINGS[uno]['ENCODING'])
-    except UnicodeDecodeError:
-        for encoding in ENCODINGS:
-            if encoding == uno:
-                continue
-            try:
-                content = data.decode(ENCODINGS[encoding]['ENCODING'])
-                break
-            except UnicodeDecodeError:
-                pass
-        else:
-            raise UnicodeError(f'This data is unreadable with ANY VALID encoding.')
+    for encoding in _fallback_encodings(uno):
+        try:
+            content = data.decode(ENCODINGS[encoding]['ENCODING'])
+            break
+        except UnicodeDecodeError:
+            pass
+    else:
+        raise UnicodeError(f'This data is unreadable with ANY VALID encoding.')
 
     # optional, checking the encoded content according to the uno
     if warn_invalid_characters:
-        metas = {
-            '\r': '\\r - Carriage return',
-            '\n': '\\n - Newline',
-            '\t': '\\t - Tab'
-        }
-        for i, c in enumerate(content):
-            if not c.isprintable() or ('ACCEPTED_CHARACTERS' in ENCODINGS[uno] and c not in ENCODINGS[uno]['ACCEPTED_CHARACTERS']):
-                print(f'Warning {uno} invalid character at index {i} {c if c not in metas else metas[c]}')
+        _warn_invalid_characters(content, uno)
 
     # special-characters defined by optional UNA segment
     if content.startswith('UNA'):
@@ -1001,49 +1277,141 @@ def parse_edi(data: bytes,
     chars = [component_separator, dataelement_separator, decimal_mark, release_char, segment_terminator, newline, carriage_return]
     assert len(chars) == len(set(chars)), f'Delimiters must be unique. Got {chars}'
 
-    # handling special-characters as non-regex-metacharacters for pattern matching
-    rc = re.escape(release_char)
-    st = re.escape(segment_terminator)
-    cr = re.escape(carriage_return)
-    nl = re.escape(newline)
-    ds = re.escape(dataelement_separator)
-    cs = re.escape(component_separator)
-
-    # (?<!...) is a negative look-behind for escaped special characters used as values
-    pattern_1 = f'(?<!{rc}){st}{cr}?{nl}'
-    pattern_2 = f'(?<!{rc}){st}'
-    pattern_3 = f'(?<!{rc}){ds}'
-    pattern_4 = f'(?<!{rc}){cs}'
-
-    # splitting content on special-characters
-    lines = [line.replace(release_char + segment_terminator, segment_terminator)
-             for line in re.split(pattern_2, re.sub(pattern_1, segment_terminator, content))][:-1]  # last seg empty
-
-    # parsing the segments
     segments = []
-    for i, line in enumerate(lines):
-        if line.startswith('UNA'):
-            assert i == 0, 'Error: multiple UNA in one message'
-            edi_chars = [component_separator, dataelement_separator, decimal_mark, release_char, SPACE, segment_terminator]
-            segments.append(['UNA', edi_chars])
-            continue
+    start = 0
+    if content.startswith('UNA'):
+        edi_chars = [component_separator, dataelement_separator, decimal_mark, release_char, SPACE, segment_terminator]
+        segments.append(['UNA', edi_chars])
+        start = 9
+        if content.startswith(carriage_return + newline, start):
+            start += 2
+        elif content.startswith(newline, start):
+            start += 1
+
+    with _gc_disabled(disable_gc):
+        return _parse_segments(segments, content, start, 0,
+                               component_separator, dataelement_separator, release_char, segment_terminator,
+                               newline, carriage_return)
+
+
+def iter_segments(fp,
+                  component_separator=COMPONENT_SEPARATOR,
+                  dataelement_separator=DATAELEMENT_SEPARATOR,
+                  decimal_mark=DECIMAL_MARK,
+                  release_char=RELEASE_CHAR,
+                  segment_terminator=SEGMENT_TERMINATOR,
+                  newline=NEWLINE,
+                  carriage_return=CARRIAGE_RETURN,
+                  warn_invalid_characters=False,
+                  default_encoding='UNOY',
+                  chunk_size=65536):
+    # the segments of parse_edi, read from a binary file-like object one chunk at a time
+    data = head = fp.read(chunk_size)
+    assert type(data) == bytes, f'Expected <bytes>, got {type(data).__qualname__}'
+    while data and len(head) < _SNIFF_SIZE:
+        data = fp.read(chunk_size)
+        head += data
+    data = head
+
+    # sniffing the (optional) encoding, the UNB is expected within the head of the interchange
+    uno = _sniff_encoding(head, default_encoding)
+
+    # the first chunk picks the decoder (if default fails, all other encodings are tried)
+    for encoding in _fallback_encodings(uno):
+        decoder = codecs.getincrementaldecoder(ENCODINGS[encoding]['ENCODING'])()
+        try:
+            content = decoder.decode(data, final=not data)
+            break
+        except UnicodeDecodeError:
+            pass
+    else:
+        raise UnicodeError(f'This data is unreadable with ANY VALID encoding.')
+    while data and len(content) < 9:  # room for the UNA
+        data = fp.read(chunk_size)
+        content += decoder.decode(data, final=not data)
 
-        if line[3] != dataelement_separator:
-            raise SyntaxError(f'Segment {i+1}: Expected datalement-separator {dataelement_separator} got {line[3]}')
+    # optional, checking the encoded content according to the uno
+    position = 0
+    if warn_invalid_characters:
+        _warn_invalid_characters(content, uno)
+        position = len(content)
 
-        segment, data_elements = line[:3], line[4:]
-        if segment not in SEGMENTS:
-            raise SyntaxError(f'Unknown segment {segment}')
-        segments.append([segment, []])
-        data_elements = [element.replace(release_char + dataelement_separator, dataelement_separator)
-                         for element in re.split(pattern_3, data_elements)]
+    # special-characters defined by optional UNA segment
+    if content.startswith('UNA'):
+        component_separator, dataelement_separator, decimal_mark, release_char, _, segment_terminator = content[3:9]
 
-        for data_element in data_elements:
-            components = [component.replace(release_char + component_separator, component_separator)
-                          for component in re.split(pattern_4, data_element)]
-            segments[len(segments) - 1][1].append(components)
+    # special-characters must be unique
+    chars = [component_separator, dataelement_separator, decimal_mark, release_char, segment_terminator, newline, carriage_return]
+    assert len(chars) == len(set(chars)), f'Delimiters must be unique. Got {chars}'
 
-    return segments
+    count = 0
+    start = 0
+    if content.startswith('UNA'):
+        yield ['UNA', [component_separator, dataelement_separator, decimal_mark, release_char, SPACE, segment_terminator]]
+        count = 1
+        start = 9
+
+    # complete segments are parsed, the rest is carried over to the next chunk
+    line_break = carriage_return + newline
+    cut = False  # a block was cut, one line-break may follow its last segment-terminator
+    while True:
+        index = _last_terminator(content, segment_terminator, release_char)
+        if index >= start:
+            block, content = content[:index+1], content[index+1:]
+            if start:  # a line-break after the UNA
+                if block.startswith(line_break, start):
+                    start += len(line_break)
+                elif block.startswith(newline, start):
+                    start += len(newline)
+            segments = _parse_segments([], block, start, count,
+                                       component_separator, dataelement_separator, release_char, segment_terminator,
+                                       newline, carriage_return)
+            count += len(segments)
+            start = 0
+            cut = True
+            yield from segments
+        if not data:
+            break  # anything after the last segment-terminator is dropped
+        data = fp.read(chunk_size)
+        text = decoder.decode(data, final=not data)
+        if warn_invalid_characters:
+            _warn_invalid_characters(text, uno, position)
+            position += len(text)
+        content += text
+
+        # one line-break after the cut segment-terminator belongs to the previous block,
+        # decided once the carried-over content is more than a part of one
+        if not cut or (data and line_break.startswith(content) and content != line_break):
+            continue
+        cut = False
+        if content.startswith(line_break):
+            content = content[len(line_break):]
+        elif content.startswith(newline):
+            content = content[len(newline):]
+
+
+@functools.lru_cache(maxsize=None)
+def _edi_formatter(component_separator=COMPONENT_SEPARATOR,
+                   dataelement_separator=DATAELEMENT_SEPARATOR,
+                   release_char=RELEASE_CHAR,
+                   segment_terminator=SEGMENT_TERMINATOR):
+    # one terminated segment per call, shared by make_edi and report,
+    # special-characters used as values are preceded by the release-char (which is released first)
+    released_rc = release_char + release_char
+    released_ds = release_char + dataelement_separator
+    released_cs = release_char + component_separator
+    released_st = release_char + segment_terminator
+
+    def edi_line(segment, data_elements):
+        return segment + dataelement_separator + dataelement_separator.join(
+            [component_separator.join(
+                [c.replace(release_char, released_rc)
+                  .replace(dataelement_separator, released_ds)
+                  .replace(component_separator, released_cs)
+                  .replace(segment_terminator, released_st)
+                 for c in components])
+             for components in data_elements]) + segment_terminator
+    return edi_line
 
 
 def make_edi(segments: list,
@@ -1063,46 +1431,36 @@ def make_edi(segments: list,
     chars = [component_separator, dataelement_separator, decimal_mark, release_char, segment_terminator, newline, carriage_return]
     assert len(chars) == len(set(chars)), f'Must be unique. Got {chars}'
 
-    strings = []
+    # segments are terminated, optionally followed by a line-break
+    line_break = (carriage_return if with_carriage_return else '') + (newline if with_newline else '')
+
+    # the encoding of the first UNB (which leads the interchange), needed before the first segment is written
+    uno = default_encoding
+    for segment, data_elements in segments:
+        if segment == 'UNB':
+            uno = data_elements[0][0]
+            break
+    encode = codecs.getincrementalencoder(ENCODINGS[uno]['ENCODING'])().encode
+    edi_line = _edi_formatter(component_separator, dataelement_separator, release_char, segment_terminator)
+
+    # each segment is encoded onto the data, no text of the whole message is built
+    data = bytearray()
     if with_una:
         una = component_separator + dataelement_separator + decimal_mark + release_char + SPACE + segment_terminator
-        strings.append('UNA' + una)
-        if with_carriage_return:
-            strings.append(carriage_return)
-        if with_newline:
-            strings.append(newline)
-
+        data += encode('UNA' + una + line_break)
+    before = ''
     for s_i, (segment, data_elements) in enumerate(segments):
         if segment == 'UNA':
             assert s_i == 0, 'Error: multiple UNA in one message'
             continue
         if segment not in SEGMENTS:
             raise SyntaxError(f'Unknown segment {segment}')
-        strings.append(segment + dataelement_separator)
-        for c_i, components in enumerate(data_elements):
-            strings.append(component_separator.join(
-                [c.replace(dataelement_separator, release_char + dataelement_separator)
-                  .replace(component_separator, release_char + component_separator)
-                  .replace(segment_terminator, release_char + segment_terminator)
-                 for c in components]))
-            if len(data_elements) - 1 != c_i:
-                strings.append(dataelement_separator)
-        strings.append(segment_terminator)
-        if len(segments)-1 != s_i:
-            if with_carriage_return:
-                strings.append(carriage_return)
-            if with_newline:
-                strings.append(newline)
-
-    for segment, dataelement in segments:
-        if segment == 'UNB':
-            uno = dataelement[0][0]
-            break
-    else:
-        uno = default_encoding
+        data += encode(before + edi_line(segment, data_elements))
+        before = line_break
 
-    data = ''.join(strings).encode(ENCODINGS[uno]['ENCODING'])
-    return data
+    # stateful codecs (UNOX) return to their initial state at the end
+    data += encode('', True)
+    return bytes(data)
 
 
 def make_xml(segments: list, root_tag='EDIFACT') -> ElementTree.Element:
@@ -1126,57 +1484,166 @@ def make_xml(segments: list, root_tag='EDIFACT') -> ElementTree.Element:
     return root
 
 
-def parse_xml(root: ElementTree.Element) -> list:
-    segments = []
+def iter_xml_bytes(segments: list, root_tag='EDIFACT'):
+    # the document of make_xml_bytes, one chunk per segment
+    if not segments:
+        yield f'<{root_tag} />'.encode('ascii', 'xmlcharrefreplace')
+        return
+    yield f'<{root_tag}>'.encode('ascii', 'xmlcharrefreplace')
 
-    for e_i, element in enumerate(root):
-        if element.tag == 'UNA':
-            assert e_i == 0, 'Error: multiple UNA in one message'
-            segments.append(['UNA', [c for c in element.text]])
+    for s_i, (segment, data_elements) in enumerate(segments):
+        if segment == 'UNA':
+            assert s_i == 0, 'Error: Multiple UNA in one message'
+            una = _escape_xml(''.join(data_elements))
+            yield (f'<UNA>{una}</UNA>' if una else '<UNA />').encode('ascii', 'xmlcharrefreplace')
             continue
-        segments.append([element.tag])
-        values = []
-        for d_i, data_element in enumerate(element):
-            values.append([])
+        if not data_elements:
+            yield f'<{segment} />'.encode('ascii', 'xmlcharrefreplace')
+            continue
+        strings = [f'<{segment}>']
+        append = strings.append
+        for d_i, data_element in enumerate(data_elements):
+            data_element_tag = f'{segment}{d_i}'
+            if not data_element:
+                append(f'<{data_element_tag} />')
+                continue
+            append(f'<{data_element_tag}>')
             for c_i, component in enumerate(data_element):
-                if component.text:
-                    values[d_i].append(component.text)
-                else:
-                    values[d_i].append('')
-        segments[e_i].append(values)
+                if not component:
+                    append(f'<{data_element_tag}{c_i} />')
+                    continue
+                if '&' in component or '<' in component or '>' in component:
+                    component = _escape_xml(component)
+                append(f'<{data_element_tag}{c_i}>{component}</{data_element_tag}{c_i}>')
+            append(f'</{data_element_tag}>')
+        append(f'</{segment}>')
+        yield ''.join(strings).encode('ascii', 'xmlcharrefreplace')
 
-    return segments
+    yield f'</{root_tag}>'.encode('ascii', 'xmlcharrefreplace')
 
 
-def pretty_xml(root: ElementTree.Element, encoding=None, indent='    ') -> str:
-    dom = xml.dom.minidom.parseString(ElementTree.tostring(root).decode())
-    return dom.toprettyxml(encoding=encoding, indent=indent)
+def make_xml_bytes(segments: list, root_tag='EDIFACT') -> bytes:
+    # same document as ElementTree.tostring(make_xml(segments)), written without building the tree
+    return b''.join(iter_xml_bytes(segments, root_tag))
 
 
-def report(segments: list, sd: dict, ed: dict) -> str:
-    lines = []
-    for s_i, (segment, data_elements) in enumerate(segments):
+def write_xml(segments: list, fp, root_tag='EDIFACT'):
+    # streams the document to a binary file-like object
+    fp.writelines(iter_xml_bytes(segments, root_tag))
+
+
+def parse_xml(root: ElementTree.Element, disable_gc=False) -> list:
+    segments = []
+
+    with _gc_disabled(disable_gc):
+        for e_i, element in enumerate(root):
+            if element.tag == 'UNA':
+                assert e_i == 0, 'Error: multiple UNA in one message'
+                segments.append(['UNA', [c for c in element.text]])
+                continue
+            segments.append([element.tag, [[component.text or '' for component in data_element]
+                                           for data_element in element]])
+
+    return segments
+
+
+def pretty_xml(root: ElementTree.Element, encoding=None, indent='    ') -> str:
+    # same layout as xml.dom.minidom's toprettyxml, without re-parsing the serialized tree
+    if encoding is None:
+        strings = ['<?xml version="1.0" ?>\n']
+    else:
+        strings = [f'<?xml version="1.0" encoding="{encoding}"?>\n']
+    if not _pretty_element(root, strings.append, indent):
+        # namespaces are mapped to prefixes by serializing, as minidom did for every tree
+        import xml.dom.minidom
+        dom = xml.dom.minidom.parseString(ElementTree.tostring(root).decode())
+        # attributes (and the xmlns declarations) in sorted order, as on the direct path
+        for node in dom.getElementsByTagName('*'):
+            attributes = sorted(node.attributes.items())
+            for name, _ in attributes:
+                node.removeAttribute(name)
+            for name, value in attributes:
+                node.setAttribute(name, value)
+        return dom.toprettyxml(encoding=encoding, indent=indent)
+    if encoding is None:
+        return ''.join(strings)
+    return ''.join(strings).encode(encoding, 'xmlcharrefreplace')
+
+
+def _positions(table):
+    # first table-index per data-element pos (every suffix of the pos as int),
+    # different versions, different pos formats '010' '0010'!!!
+    positions = {}
+    for index, row in enumerate(table):
+        pos = row['pos']
+        if pos:
+            for i in range(len(pos)):
+                if pos[i] != '0':
+                    positions.setdefault(int(pos[i:]), index)
+    return positions
+
+
+# the parts of a segment definition used per data-element, with its table indexed by pos
+_SegmentSchema = collections.namedtuple('_SegmentSchema', ['name', 'description', 'table', 'positions'])
+
+
+def _segment_schema(schemas, sd, segment):
+    # resolved once per segment type and call
+    schema = schemas.get(segment)
+    if schema is None:
+        definition = sd[segment]
+        table = definition['table']
+        schema = schemas[segment] = _SegmentSchema(definition['name'], definition['description'], table,
+                                                   _positions(table))
+    return schema
+
+
+_NON_DIGIT = re.compile(r'\D')
+_NUMERIC = re.compile(r'\d*(\.|,)?\d+')
+
+
+@functools.lru_cache(maxsize=None)
+def _representation(representation):
+    # 'an..35' is up to 35 alphanumeric characters, 'n3' exactly 3 numeric characters
+    variable = '..' in representation
+    if variable:
+        t, d, = representation.split('..')
+    else:
+        d = _NON_DIGIT.sub('', representation)
+        t = representation[:representation.index(d)]
+    assert t in ['a', 'n', 'an'], f'Invalid representation-type <{t}>'
+    assert d.isdigit(), f'Invalid representation-digits <{d}>'
+    return t, d, int(d), variable
+
+
+def _report_blocks(segments, sd, ed, offset=0):
+    blocks = []  # one block of lines per segment
+    schemas = {}
+    format_line = _edi_formatter()
+    for s_i, (segment, data_elements) in enumerate(segments, offset):
         if segment not in sd:
             if segment != 'UNA':
-                lines.append(f'ERROR: skipping undefined segment: <{segment}> at index {s_i}')
+                blocks.append(f'ERROR: skipping undefined segment: <{segment}> at index {s_i}')
             continue
-        table = sd[segment]['table']
-        edi_line = make_edi([segments[s_i]], with_una=False).decode('utf8')  # todo?
-        lines.append(edi_line)
-        lines.append('-' * len(edi_line))
-        segment_name = f"{sd[segment]['name']} <{segment}>"
-        lines.append(segment_name)
+        lines = []
+        append = lines.append
+        schema = _segment_schema(schemas, sd, segment)
+        table = schema.table
+        edi_line = format_line(segment, data_elements)
+        append(edi_line)
+        append('-' * len(edi_line))
+        segment_name = f"{schema.name} <{segment}>"
+        append(segment_name)
         for i_d, data_element in enumerate(data_elements):
-            pos = str((i_d+1)*10)
-            # different versions, different pos formats '010' '0010'!!!
-            cd = [r for r in table if r['pos'] and r['pos'].endswith(pos)][0]
-            start = table.index(cd)
-            if cd['representation'] is None:
+            start = schema.positions[(i_d+1)*10]
+            cd = table[start]
+            cd_representation = cd['representation']
+            if cd_representation is None:
                 start += 1
                 name = cd['name']
                 code = cd['code']
                 msg = f'  {name} ({code})'
-                lines.append(msg)
+                append(msg)
             for i_r, r in enumerate(table[start:]):
                 if len(data_element) == i_r:
                     break
@@ -1185,115 +1652,131 @@ def report(segments: list, sd: dict, ed: dict) -> str:
                 name = r['name']
                 msg = f"    {name} <{component}> ({code})"
                 code_name = None
-                if component and 'table' in ed[code]:  # todo empty components?
-                    if component not in ed[code]['table']:
+                code_table = ed[code].get('table') if component else None
+                if code_table is not None:  # todo empty components?
+                    code_definition = code_table.get(component)
+                    if code_definition is None:
                         err_msg = f"    ERROR: unknown code <{component}> not in ({code})"
-                        lines.append(err_msg)
+                        append(err_msg)
                     else:
-                        code_name = ed[code]['table'][component]['name']
+                        code_name = code_definition['name']
                 if code_name:
-                    lines.append(msg + ' ' + code_name)
+                    append(msg + ' ' + code_name)
                 else:
-                    lines.append(msg)
+                    append(msg)
                 if component:
                     representation = r['representation']
                     repr_errors = []
-                    if '..' in representation:
-                        t, d, = representation.split('..')
-                    else:
-                        d = re.sub('\D', '', representation)
-                        t = representation[:representation.index(d)]
-                    assert t in ['a', 'n', 'an'], f'Invalid representation-type <{t}>'
-                    assert d.isdigit(), f'Invalid representation-digits <{d}>'
+                    t, d, length, variable = _representation(representation)
 
                     if t == 'a':
                         if not component.isalpha():
                             repr_errors.append('is not alphanumeric.')
                     if t == 'n':
-                        if not re.match('\d*(\.|,)?\d+', component):
+                        if not _NUMERIC.match(component):
                             repr_errors.append('is not numeric.')
                     if t == 'an':
                         pass
 
-                    if '..' in representation and not len(component) <= int(d):
+                    if variable and not len(component) <= length:
                         repr_errors.append(f'repr: {representation},  max. len {d}')
-                    if '..' not in representation and len(component) != int(d):
+                    if not variable and len(component) != length:
                         repr_errors.append(f'repr: {representation}, exact len {d}')
 
                     if repr_errors:
                         for e in repr_errors:
                             # print('    ERROR:', e)
-                            lines.append('    ERROR:' + str(e))
+                            append('    ERROR:' + str(e))
                 if not component and r['mc'] == 'M':
-                    if not cd['representation'] is None:
-                        lines.append(f'\n    Error, component <{code}> in segment {segment}')
-        lines.append('')
-    return '\n'.join(lines)
+                    if not cd_representation is None:
+                        append(f'\n    Error, component <{code}> in segment {segment}')
+        append('')
+        blocks.append('\n'.join(lines))
+    return blocks
+
+
+# sd and ed of a report worker-process, passed once per process instead of once per chunk
+_report_definitions = None
+
+
+def _init_report_worker(sd, ed):
+    global _report_definitions
+    _report_definitions = sd, ed
+
+
+def _report_chunk(segments, offset):
+    sd, ed = _report_definitions
+    return _report_blocks(segments, sd, ed, offset)
+
+
+def report(segments: list, sd: dict, ed: dict, parallel=False) -> str:
+    # segments are reported independently, one chunk per process (no more processes than segments)
+    processes = min(os.cpu_count() or 1, len(segments)) or 1
+    size = -(-len(segments) // processes) or 1
+    offsets = range(0, len(segments), size)
+    if not parallel or len(offsets) <= 1:
+        return '\n'.join(_report_blocks(segments, sd, ed))
+
+    import multiprocessing
+    with multiprocessing.Pool(len(offsets), _init_report_worker, (sd, ed)) as pool:
+        chunks = pool.starmap(_report_chunk, [(segments[offset:offset+size], offset) for offset in offsets])
+    return '\n'.join([block for blocks in chunks for block in blocks])
 
 
 def make_edi_xml(segments: list, sd: dict, ed: dict, root_tag='EDIFACT') -> ElementTree.Element:
     root = ElementTree.Element(root_tag)
+    schemas = {}
     for segment, data_elements in segments:
         if segment == 'UNA':
             ElementTree.SubElement(root, 'UNA').text = ''.join(data_elements)
             continue
 
-        seg_element = ElementTree.SubElement(root, segment)
-        name = sd[segment]['name']
-        description = sd[segment]['description']
-        table = sd[segment]['table']
-
-        seg_element.attrib['description'] = description
-        seg_element.attrib['name'] = name
+        schema = _segment_schema(schemas, sd, segment)
+        table = schema.table
+        seg_element = ElementTree.SubElement(root, segment, {'description': schema.description, 'name': schema.name})
 
         for d_i, data_element in enumerate(data_elements):
             data_element_tag = '%s%s' % (segment, d_i)
-            data_sub_element = ElementTree.SubElement(seg_element, data_element_tag)
 
-            pos = str((d_i+1)*10)
-            cd = [r for r in table if r['pos'] and r['pos'].endswith(pos)][0]
-            start = table.index(cd)
+            pos = (d_i+1)*10
+            start = schema.positions[pos]
+            cd = table[start]
 
+            attrib = {}
             if cd['representation'] is None:
                 start += 1
-                data_sub_element.attrib['pos'] = pos
-                data_sub_element.attrib['code'] = cd['code']  # group code
-                data_sub_element.attrib['name'] = cd['name']
-
-            if cd['representation'] is not None and cd['pos'] is not None:
-                data_sub_element.attrib['pos'] = pos
-
+                attrib = {'pos': str(pos), 'code': cd['code'], 'name': cd['name']}  # group code
+            elif cd['pos'] is not None:
+                attrib = {'pos': str(pos)}
             if cd['repeat']:
-                data_sub_element.attrib['repeat'] = str(cd['repeat'])
-                data_sub_element.attrib['mc'] = cd['mc']
+                attrib['repeat'] = str(cd['repeat'])
+                attrib['mc'] = cd['mc']
+            data_sub_element = ElementTree.SubElement(seg_element, data_element_tag, attrib)
 
+            rows = table[start:start+len(data_element)]
             for c_i, component in enumerate(data_element):
                 component_tag = '%s%s%s' % (segment, d_i, c_i)
-                component_sub_element = ElementTree.SubElement(data_sub_element, component_tag)
+                attrib = {}
+                if c_i < len(rows):
+                    r = rows[c_i]
+                    c_code = r['code']
+                    attrib = {
+                        'code': c_code,
+                        'name': r['name'],
+                        'mc': r['mc'],
+                        'representation': r['representation']
+                    }
+                    code_table = ed[c_code].get('table')
+                    if code_table is not None and component:
+                        code = code_table.get(component)
+                        if code is not None:
+                            attrib['value'] = code['name']
+                            attrib['description'] = code['description']
+                        else:
+                            attrib['value'] = 'CUSTOM CODE'
+                component_sub_element = ElementTree.SubElement(data_sub_element, component_tag, attrib)
                 if component:
                     component_sub_element.text = component
-
-            for i_r, r in enumerate(table[start:]):
-                if len(data_element) == i_r:
-                    break
-                c_code = r['code']
-                c_component = data_element[i_r]
-                c_name = r['name']
-                c_mc = r['mc']
-                c_repr = r['representation']
-
-                data_sub_element[i_r].attrib = {
-                    'code': c_code,
-                    'name': c_name,
-                    'mc': c_mc,
-                    'representation': c_repr
-                }
-                if 'table' in ed[c_code] and c_component:
-                    if c_component in ed[c_code]['table']:
-                        data_sub_element[i_r].attrib['value'] = ed[c_code]['table'][c_component]['name']
-                        data_sub_element[i_r].attrib['description'] = ed[c_code]['table'][c_component]['description']
-                    else:
-                        data_sub_element[i_r].attrib['value'] = 'CUSTOM CODE'
     return root
 
 
@@ -1,19 +1,71 @@
 """D18A"""
+import re
 import json
+import functools
 from tkinter import *
 from tkinter.ttk import Combobox
 from tkinter.scrolledtext import ScrolledText
 from tkinter.filedialog import askopenfilename
 from tkinter.messagebox import showerror
-from ast import literal_eval
 from edixml import *
 
+
+def load_definitions(*files):
+    # later files extend (and override) the definitions of earlier ones
+    definitions = {}
+    for file in files:
+        with open(file) as fp:
+            definitions.update(json.load(fp))
+    return definitions
+
+
+def dump_segments(segments):
+    # one segment per line, read back with json.loads
+    return '[\n%s\n]' % ',\n'.join(json.dumps(segment, ensure_ascii=False) for segment in segments)
+
+
+def common_prefix(a, b):
+    # bisect on slice comparisons, they run in C instead of a loop per character
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+# Tcl counts a character beyond U+FFFF as two index-units (a surrogate pair), Python as one
+ASTRAL = re.compile('[\U00010000-\U0010FFFF]')
+
+
+def tk_offset(text, offset):
+    # the '+Nc' count of Tk for the code-point offset into text
+    return offset + len(ASTRAL.findall(text, 0, offset))
+
+
 # Segment definitions D18A with Service Segments V4
-SD = {**json.loads(open('d18a_segments.json').read()), **json.loads(open('V42-9735-10_service_segments.json').read())}
+SD = load_definitions('d18a_segments.json', 'V42-9735-10_service_segments.json')
 # Element definitions D18A with Service Elements V4
-ED = {**json.loads(open('d18a_codes.json').read()), **json.loads(open('V42-9735-10_service_codes.json').read())}
+ED = load_definitions('d18a_codes.json', 'V42-9735-10_service_codes.json')
 # Message definitions D18A
-MD = json.loads(open('d18a_messages.json').read())
+MD = load_definitions('d18a_messages.json')
+# Sorted choices of the comboboxes, the service definitions are merged in after D18A
+MD_KEYS = tuple(sorted(MD))
+SD_KEYS = tuple(sorted(SD))
+ED_KEYS = tuple(sorted(ED))
+
+
+# The definitions never change, each table is formatted on its first selection only
+@functools.lru_cache(maxsize=None)
+def segment_text(seg):
+    return pprint.pformat(SD[seg]['table'], width=200)
+
+
+@functools.lru_cache(maxsize=None)
+def code_text(code):
+    return pprint.pformat(ED[code]['table']) if 'table' in ED[code] else ''
 
 
 class Editor(Toplevel):
@@ -23,9 +75,15 @@ class Editor(Toplevel):
 
     @text.setter
     def text(self, value):
+        # only the changed middle is replaced, the common start and end stay in the widget
+        old = self.sc_text.get('1.0', 'end-1c')
+        if old == value:
+            return
+        start = common_prefix(old, value)
+        end = common_prefix(old[start:][::-1], value[start:][::-1])
         pos = self.sc_text.yview()
-        self.sc_text.delete('1.0', END)
-        self.sc_text.insert(END, value)
+        self.sc_text.delete('1.0+%dc' % tk_offset(old, start), '1.0+%dc' % tk_offset(old, len(old) - end))
+        self.sc_text.insert('1.0+%dc' % tk_offset(old, start), value[start:len(value) - end])
         self.sc_text.yview_moveto(pos[0])
 
     def __init__(self, master):
@@ -33,9 +91,14 @@ class Editor(Toplevel):
 
         self.index_matches = None
         self.current_index = None
+        self.search_start = '1.0'
+        self.search_after_id = None
+        self.pattern = None
 
         self.search_content = StringVar()
         self.sc_text = ScrolledText(self, wrap=NONE)
+        self.sc_text.tag_config('found', background="green")
+        self.sc_text.configure(yscrollcommand=self.yscroll)
 
         self.x_scrollbar_content_text = Scrollbar(self, orient=HORIZONTAL, command=self.sc_text.xview)
         self.sc_text.configure(xscrollcommand=self.x_scrollbar_content_text.set)
@@ -44,7 +107,7 @@ class Editor(Toplevel):
 
         Button(self, text='<-', command=self.click_prev_button).grid(row=0, column=0)
         self.search_content_entry = Entry(self, textvariable=self.search_content)
-        self.search_content_entry.bind('<KeyRelease>', lambda event : self.highlight_pattern(event.widget.get()))
+        self.search_content_entry.bind('<KeyRelease>', lambda event : self.schedule_highlight(event.widget.get()))
         self.search_content_entry.grid(row=0, column=1, sticky=W + E)
         Button(self, text='->', command=self.click_next_button).grid(row=0, column=2)
         Checkbutton(self, text="Wrap Text", variable=self.wrap_text,
@@ -66,7 +129,7 @@ class Editor(Toplevel):
         else:
             self.current_index += 1
         self.current_index %= len(self.index_matches)
-        self.sc_text.see(self.index_matches[self.current_index])
+        self.sc_text.see('%s+%dc' % (self.search_start, self.index_matches[self.current_index]))
 
     def click_prev_button(self):
         if not self.index_matches:
@@ -76,39 +139,70 @@ class Editor(Toplevel):
         else:
             self.current_index -= 1
         self.current_index %= len(self.index_matches)
-        self.sc_text.see(self.index_matches[self.current_index])
+        self.sc_text.see('%s+%dc' % (self.search_start, self.index_matches[self.current_index]))
+
+    def schedule_highlight(self, pattern, delay=150):
+        # while typing only the last pattern is searched
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(delay, self.highlight_pattern, pattern)
+
+    def search(self, pattern, start, end):
+        # (start, end) index of each match
+        count = IntVar()
+        matches = []
+        index = self.sc_text.search(pattern, start, end, count=count)
+        while index:
+            match_index = "%s+%sc" % (index, count.get())
+            matches.append((index, match_index))
+            index = self.sc_text.search(pattern, match_index, end, count=count)
+        return matches
+
+    def highlight_visible(self):
+        # only the matches on the visible lines are tagged, scrolling tags the new ones
+        self.sc_text.tag_remove('found', '1.0', END)
+        if not self.pattern:
+            return
+        start = self.sc_text.index('@0,0 linestart')
+        end = self.sc_text.index('@0,%d lineend' % self.sc_text.winfo_height())
+        ranges = [index for match in self.search(self.pattern, start, end) for index in match]
+        if ranges:
+            self.sc_text.tag_add('found', *ranges)
+
+    def yscroll(self, first, last):
+        self.sc_text.vbar.set(first, last)
+        self.highlight_visible()
 
     def highlight_pattern(self, pattern, start="1.0", end="end"):
-        for t in self.sc_text.tag_names():
-            self.sc_text.tag_delete(t)
+        self.search_after_id = None
+        self.pattern = pattern
+        self.highlight_visible()
 
         if not pattern:
             return
+        # offsets of the match ends in Tk index-units, converted to text indices only when navigated to
+        self.search_start = self.sc_text.index(start)
+        text = self.sc_text.get(self.search_start, end)
         self.index_matches = []
+        astral = 0  # characters beyond U+FFFF up to the previous match, counted once per stretch
+        previous = 0
+        offset = text.find(pattern)
+        while offset != -1:
+            offset += len(pattern)
+            astral += len(ASTRAL.findall(text, previous, offset))
+            previous = offset
+            self.index_matches.append(offset + astral)
+            offset = text.find(pattern, offset)
         self.current_index = None
 
-        self.sc_text.tag_config('found', background="green")
-        start = self.sc_text.index(start)
-        end = self.sc_text.index(end)
-        self.sc_text.mark_set("matchStart", start)
-        self.sc_text.mark_set("matchEnd", start)
-        self.sc_text.mark_set("searchLimit", end)
-        count = IntVar()
-        while True:
-            index = self.sc_text.search(pattern, "matchEnd", "searchLimit", count=count)
-            if index == "":
-                break
-            self.sc_text.mark_set("matchStart", index)
-            match_index = "%s+%sc" % (index, count.get())
-            self.index_matches.append(match_index)
-            self.sc_text.mark_set("matchEnd", match_index)
-            self.sc_text.tag_add('found', "matchStart", "matchEnd")
-
 
 class GUI(Tk):
     def __init__(self):
         super().__init__()
         self.segments = None
+        self.segments_key = None
+        self.edit_after_id = None
+        self.report_after_id = None
         self.wm_title(__doc__)
 
         self.menubar = Menu(self)
@@ -120,19 +214,19 @@ class GUI(Tk):
 
         self.lbl_message = Label(self, text='Message')
         self.lbl_message.grid(row=0, column=0)
-        self.cb_message = Combobox(self, values=list(MD))
+        self.cb_message = Combobox(self, values=MD_KEYS)
         self.cb_message.bind('<<ComboboxSelected>>', self.select_message)
         self.cb_message.grid(row=1, column=0)
 
         self.lbl_segment = Label(self, text='Segment')
         self.lbl_segment.grid(row=0, column=1)
-        self.cb_segment = Combobox(self, values=list(SD))
+        self.cb_segment = Combobox(self, values=SD_KEYS)
         self.cb_segment.bind('<<ComboboxSelected>>', self.select_segment)
         self.cb_segment.grid(row=1, column=1)
 
         self.lbl_code = Label(self, text='Code')
         self.lbl_code.grid(row=0, column=2)
-        self.cb_code = Combobox(self, values=list(ED))
+        self.cb_code = Combobox(self, values=ED_KEYS)
         self.cb_code.bind('<<ComboboxSelected>>', self.select_code)
         self.cb_code.grid(row=1, column=2)
 
@@ -158,43 +252,56 @@ class GUI(Tk):
         self.editor_code = Editor(self)
 
         self.editor_edi = Editor(self)
-        self.editor_edi.sc_text.bind('<KeyRelease>', self.edit_edifact)
+        self.editor_edi.sc_text.bind('<KeyRelease>', lambda event: self.schedule_edit(self.edit_edifact))
         self.editor_edi.title('EDI')
 
         self.editor_segments = Editor(self)
-        self.editor_segments.sc_text.bind('<KeyRelease>', self.edit_segments)
+        self.editor_segments.sc_text.bind('<KeyRelease>', lambda event: self.schedule_edit(self.edit_segments))
         self.editor_segments.title('Segments')
 
         self.editor_xml = Editor(self)
-        self.editor_xml.sc_text.bind('<KeyRelease>', self.edit_xml)
+        self.editor_xml.sc_text.bind('<KeyRelease>', lambda event: self.schedule_edit(self.edit_xml))
         self.editor_xml.title('XML')
 
         self.editor_report = Editor(self)
         self.editor_report.title('Report')
 
+        self.renderers = {
+            self.editor_edi: lambda: make_edi(self.segments, with_newline=True).decode('utf8'),
+            self.editor_segments: lambda: dump_segments(self.segments),
+            self.editor_xml: lambda: pretty_xml(make_edi_xml(self.segments, SD, ED)),
+            self.editor_report: lambda: report(self.segments, SD, ED),
+        }
+        # segments key each editor shows, None like the key while nothing is loaded
+        self.editor_keys = {}
+
         self.mainloop()
 
     def switch_edi(self, event=None):
         if self.var_edi.get():
             self.editor_edi.deiconify()
+            self.refresh(self.editor_edi)
         else:
             self.editor_edi.withdraw()
 
     def switch_segments(self, event=None):
         if self.var_segments.get():
             self.editor_segments.deiconify()
+            self.refresh(self.editor_segments)
         else:
             self.editor_segments.withdraw()
 
     def switch_xml(self, event=None):
         if self.var_xml.get():
             self.editor_xml.deiconify()
+            self.refresh(self.editor_xml)
         else:
             self.editor_xml.withdraw()
 
     def switch_report(self, event=None):
         if self.var_report.get():
             self.editor_report.deiconify()
+            self.refresh(self.editor_report)
         else:
             self.editor_report.withdraw()
 
@@ -211,19 +318,49 @@ class GUI(Tk):
         seg = self.cb_segment.get()
         self.editor_segment.deiconify()
         self.editor_segment.title(f'{SD[seg]["name"]}')
-        self.editor_segment.text = pprint.pformat(SD[seg]['table'], width=200)
+        self.editor_segment.text = segment_text(seg)
 
     def select_code(self, event=None):
         code = self.cb_code.get()
         self.editor_code.deiconify()
         self.editor_code.title(f'{ED[code]["name"]}')
-        if 'table' in ED[code]:
-            self.editor_code.text = pprint.pformat(ED[code]['table'])
-        else:
-            self.editor_code.text = ''
+        self.editor_code.text = code_text(code)
+
+    def refresh(self, *editors):
+        # hidden editors are skipped, switching one on catches it up
+        for editor in editors:
+            if editor.state() != 'withdrawn' and self.editor_keys.get(editor) != self.segments_key:
+                editor.text = self.renderers[editor]()
+                self.editor_keys[editor] = self.segments_key
 
     def report(self):
-        self.editor_report.text = report(self.segments, SD, ED)
+        # the report is the slowest output, it follows once the other editors are drawn
+        if self.report_after_id is not None:
+            self.after_cancel(self.report_after_id)
+        self.report_after_id = self.after_idle(self.run_report)
+
+    def run_report(self):
+        self.report_after_id = None
+        self.refresh(self.editor_report)
+
+    def segments_changed(self):
+        # a keystroke that leaves the segments as they are (like whitespace) regenerates nothing
+        key = repr(self.segments)
+        if key == self.segments_key:
+            return False
+        self.segments_key = key
+        return True
+
+    def schedule_edit(self, edit, delay=300):
+        # while typing only the last keystroke is parsed, one pending edit for all editors
+        # so a burst in another editor replaces it instead of overwriting that editor later
+        if self.edit_after_id is not None:
+            self.after_cancel(self.edit_after_id)
+        self.edit_after_id = self.after(delay, self.run_edit, edit)
+
+    def run_edit(self, edit):
+        self.edit_after_id = None
+        edit()
 
     def edit_xml(self, event=None):
         try:
@@ -231,18 +368,22 @@ class GUI(Tk):
         except Exception as err:
             showerror('Edit XML Error', err)
             return
-        self.editor_edi.text = make_edi(self.segments, with_newline=True).decode('utf8')
-        self.editor_segments.text = pprint.pformat(self.segments)
+        if not self.segments_changed():
+            return
+        self.editor_keys[self.editor_xml] = self.segments_key
+        self.refresh(self.editor_edi, self.editor_segments)
         self.report()
 
     def edit_segments(self, event=None):
         try:
-            self.segments = literal_eval(self.editor_segments.text)
+            self.segments = json.loads(self.editor_segments.text)
         except Exception as err:
             showerror('Edit Segments Error', err)
             return
-        self.editor_edi.text = make_edi(self.segments, with_newline=True).decode('utf8')
-        self.editor_xml.text = pretty_xml(make_edi_xml(self.segments, SD, ED))
+        if not self.segments_changed():
+            return
+        self.editor_keys[self.editor_segments] = self.segments_key
+        self.refresh(self.editor_edi, self.editor_xml)
         self.report()
 
     def edit_edifact(self, event=None):
@@ -251,8 +392,10 @@ class GUI(Tk):
         except Exception as err:
             showerror('Edit EDI Error', err)
             return
-        self.editor_segments.text = pprint.pformat(self.segments)
-        self.editor_xml.text = pretty_xml(make_edi_xml(self.segments, SD, ED))
+        if not self.segments_changed():
+            return
+        self.editor_keys[self.editor_edi] = self.segments_key
+        self.refresh(self.editor_segments, self.editor_xml)
         self.report()
 
     def reload(self):
@@ -270,9 +413,10 @@ class GUI(Tk):
             self.cb_message.set(message)
             self.select_message()
 
-        self.editor_edi.text = make_edi(self.segments, with_newline=True).decode('utf8')
-        self.editor_segments.text = pprint.pformat(self.segments)
-        self.editor_xml.text = pretty_xml(make_edi_xml(self.segments, SD, ED))
+        # a loaded file replaces whatever the editors show, even the same segments
+        self.segments_changed()
+        self.editor_keys.clear()
+        self.refresh(self.editor_edi, self.editor_segments, self.editor_xml)
 
     def open_edi(self):
         file = askopenfilename(title='Open EDI')